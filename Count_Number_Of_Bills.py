@@ -13,15 +13,21 @@ def count_pdfs_in_bills_folders(parent_folder):
         int: The total count of .pdf files in "Bills" folders.
     """
     total_pdf_count = 0
-
-    # Walk through the directory tree
-    for root, dirs, files in os.walk(parent_folder):
-        # Check if the current directory is named "Bills"
-        if os.path.basename(root) == "Bills":
-            # If it is, count the PDF files in it
-            for file in files:
-                if file.lower().endswith(".pdf"):
+    in_bills = os.path.basename(parent_folder) == "Bills"
+
+    # os.scandir entries carry their file type, so no extra stat() per file
+    try:
+        with os.scandir(parent_folder) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    # Like os.walk, don't descend into symlinked folders
+                    if not entry.is_symlink():
+                        total_pdf_count += count_pdfs_in_bills_folders(entry.path)
+                elif in_bills and entry.name.lower().endswith(".pdf"):
                     total_pdf_count += 1
+    except OSError:
+        # Unreadable folders are skipped, as os.walk does
+        pass
     return total_pdf_count
 
 
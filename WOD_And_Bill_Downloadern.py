@@ -1,8 +1,10 @@
 import os
+import re
+import json
 import asyncio
 import logging
 from pathlib import Path
-from datetime import datetime
+from datetime import date
 from playwright.async_api import async_playwright
 #01-Jan-2018 - 31-Dec-2020
 # === Configuration ===
@@ -10,128 +12,234 @@ USERNAME      = os.getenv("LNT_USER", "USER")
 PASSWORD      = os.getenv("LNT_PASS", "PASS")
 LOGIN_URL     = "https://partners.lntecc.com/PartnerMgmtApp/login"
 DOWNLOAD_ROOT = Path.home() / "Desktop" / "LNT_Partner_Downloads"
+CHECKPOINT    = DOWNLOAD_ROOT / "checkpoint.jsonl"  # invoices fully processed; delete to re-check all
 HEADLESS      = False  # Keep False for manual steps
 TIMEOUT = 60000
+TABS          = int(os.getenv("LNT_TABS", "1"))  # parallel grid tabs; keep ≤ 6
+BLOCKED_RESOURCES = {"image", "media"}  # never fetched once logged in (fonts draw the fa icons)
+
+PAGER_TOTAL_RE = re.compile(r"of (\d+) items")
+REG_DATE_RE = re.compile(r"(\d{1,2})-([A-Za-z]{3})-(\d{4})")  # e.g. 05-Apr-2019
+MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1)}
+FY_LABELS = {y: f"{y}-{y+1}" for y in range(2000, 2100)}  # FY start year → "YYYY-YYYY"
+INVALID_NAME_CHARS = r'\/:*?"<>|'
+SAFE_NAME_TABLE = str.maketrans(INVALID_NAME_CHARS, "-" * len(INVALID_NAME_CHARS))
+
+# Selectors (shared by every row, page and tab)
+GRID_ROWS_SEL     = "table.k-grid-table tbody tr"
+INVOICE_LINK_SEL  = "td:nth-child(1) span.eip-link"   # relative to a grid row
+DATE_CELL_SEL     = "td:nth-child(2)"
+WO_LINK_SEL       = "td:nth-child(6) span.eip-link"
+SITE_CELL_SEL     = "td:nth-child(9)"
+BILL_LINK_SEL     = "span.eip-link.src-list"
+PDF_TOOLBAR_SEL   = "div.pdf-btn-container"
+DOWNLOAD_BTN_SEL  = 'button.eip-pdf-button:has(i[title="Download"])'
+CLOSE_VIEWER_SEL  = 'i.pull-right[title="Close"]'  # fa-times-circle or fa-times
+ACTIVE_TAB_SEL    = ".mat-tab-label.mat-tab-label-active"
+CLOSE_TAB_SEL     = f"{ACTIVE_TAB_SEL} > div.mat-tab-label-content > i.fa.fa-times-circle[title='Close']"
+PAGER_INPUT_SEL   = "kendo-pager-input input.k-input"
+PAGER_NEXT_SEL    = "kendo-pager-next-buttons span.k-link.k-pager-nav"
+FIRST_INVOICE_SEL = f"{GRID_ROWS_SEL}:nth-child(1) {INVOICE_LINK_SEL}"
+FIRST_INVOICE_CHANGED_JS = f"""(oldInvoice) => {{
+    const el = document.querySelector('{FIRST_INVOICE_SEL}');
+    return el && el.textContent.trim() !== oldInvoice.trim();
+}}"""
+# [invoice, registration date, job site, work order] text per grid row, in one round-trip
+ROW_CELLS_JS = f"""rows => rows.map(r => ['{INVOICE_LINK_SEL}', '{DATE_CELL_SEL}', '{SITE_CELL_SEL}', '{WO_LINK_SEL}']
+    .map(sel => {{ const el = r.querySelector(sel); return el ? el.textContent : null; }}))"""
+TEXTS_JS = "els => els.map(el => el.textContent)"
+ACTIVE_TAB_CHANGED_JS = f"""(oldLabel) => {{
+    const el = document.querySelector('{ACTIVE_TAB_SEL}');
+    return !el || el.textContent !== oldLabel;
+}}"""
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 
+async def block_assets(route):
+    """Abort requests the scraper never looks at; PDFs and XHR pass through."""
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
 def get_financial_year(date_obj, start_month=4):
     year = date_obj.year
     if date_obj.month < start_month:
-        return f"{year-1}-{year}"
-    else:
-        return f"{year}-{year+1}"
+        year -= 1
+    return FY_LABELS.get(year) or f"{year}-{year+1}"
+
+def parse_registration_date(date_str):
+    """Parse a grid date like '05-Apr-2019' (strptime "%d-%b-%Y" without its per-call overhead)."""
+    match = REG_DATE_RE.fullmatch(date_str)
+    if not match or match.group(2).lower() not in MONTHS:
+        raise ValueError(f"time data {date_str!r} does not match format '%d-%b-%Y'")
+    day, month, year = match.groups()
+    return date(int(year), MONTHS[month.lower()], int(day))
 
 def safe_filename(name: str) -> str:
     """Sanitize names for filesystem safety."""
-    invalid_chars = r'\/:*?"<>|'
-    return "".join("-" if c in invalid_chars else c for c in name).strip()[:100]
+    return name.translate(SAFE_NAME_TABLE).strip()[:100]
+
+def scan_downloaded(root):
+    """Return the paths of all PDFs already under *root*, so reruns skip them without a stat each."""
+    found = set()
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    found |= scan_downloaded(entry.path)
+                elif entry.name.lower().endswith(".pdf"):
+                    found.add(entry.path)
+    except OSError:
+        pass
+    return found
+
+def load_checkpoint(path):
+    """Invoice numbers recorded as fully processed by earlier runs."""
+    processed = set()
+    try:
+        with open(path, encoding="utf-8") as fp:
+            for line in fp:
+                try:
+                    processed.add(json.loads(line)["inv"])
+                except (ValueError, KeyError):
+                    pass  # torn last line after a crash
+    except FileNotFoundError:
+        pass
+    return processed
+
+def mark_processed(processed, invoice_no):
+    processed.add(invoice_no)
+    # one short line per append, so an interrupted run loses at most this entry
+    with open(CHECKPOINT, "a", encoding="utf-8") as fp:
+        fp.write(json.dumps({"inv": invoice_no}) + "\n")
+
+async def save_download(download, pdf_path):
+    await download.save_as(pdf_path)
+    logging.info(f"Downloaded PDF: {pdf_path.name}")
+    return pdf_path
 
 async def download_pdf_modal(page, pdf_path):
-    """Click the embedded PDF download button, save file, then close the viewer."""
-    await page.wait_for_selector("div.pdf-btn-container", timeout=TIMEOUT)
-    download_button = page.locator('button.eip-pdf-button:has(i[title="Download"])')
+    """Click the embedded PDF download button, close the viewer; return the task saving the file."""
+    await page.wait_for_selector(PDF_TOOLBAR_SEL, timeout=TIMEOUT)
+    download_button = page.locator(DOWNLOAD_BTN_SEL)
     async with page.expect_download() as dl:
         await download_button.first.click()
     download = await dl.value
-    await download.save_as(pdf_path)
-    logging.info(f"Downloaded PDF: {pdf_path.name}")
-    # Close the viewer (either fa-times-circle or fa-times)
-    await page.locator('i.fa-times-circle.pull-right[title="Close"], i.fa-times.pull-right[title="Close"]').first.click()
-    await asyncio.sleep(0.5)
+    # Save in the background so the disk write overlaps the next clicks
+    save_task = asyncio.create_task(save_download(download, pdf_path))
+    try:
+        # Close the viewer
+        await page.locator(CLOSE_VIEWER_SEL).first.click()
+        await page.wait_for_selector(PDF_TOOLBAR_SEL, state="hidden", timeout=TIMEOUT)
+    except BaseException:
+        # the caller never gets the task, so finish the save before failing
+        await asyncio.gather(save_task, return_exceptions=True)
+        raise
+    return save_task
 
 async def close_invoice_tab(page, invoice_no):
     """Click the Close icon in the active invoice tab to close it."""
-    close_tab_button = page.locator(
-        ".mat-tab-label.mat-tab-label-active > div.mat-tab-label-content > i.fa.fa-times-circle[title='Close']"
-    ).first
+    close_tab_button = page.locator(CLOSE_TAB_SEL).first
 
     if await close_tab_button.count():
+        tab_label = await page.locator(ACTIVE_TAB_SEL).first.text_content()
         await close_tab_button.click()
-        await asyncio.sleep(0.5)
+        await page.wait_for_function(ACTIVE_TAB_CHANGED_JS, tab_label, timeout=TIMEOUT)
     else:
         logging.warning(f"Unable to find Close icon for invoice tab {invoice_no}")
 
-async def process_row(page, row, invoice_no, base_folder):
-    # Extract Job Site (column 9)
-    site_name = (await row.locator("td:nth-child(9)").text_content()) or "Unknown Site"
-    site_name = safe_filename(site_name)
+async def process_row(page, row, invoice_no, date_str, site_name, work_order_text, base_folder, done):
+    # Job Site (column 9)
+    site_name = safe_filename(site_name or "Unknown Site")
 
-    # Extract and parse financial year from Registration Date (column 2)
-    date_str = (await row.locator("td:nth-child(2)").text_content() or "").strip()
+    # Parse financial year from Registration Date (column 2)
+    date_str = (date_str or "").strip()
     if not date_str:
         logging.warning(f"Empty Registration Date for invoice {invoice_no}, using current date as fallback")
-        date_obj = datetime.now()
+        date_obj = date.today()
     else:
         try:
-            date_obj = datetime.strptime(date_str, "%d-%b-%Y")
+            date_obj = parse_registration_date(date_str)
         except Exception as e:
             logging.warning(f"Failed parsing Registration Date '{date_str}': {e}")
-            date_obj = datetime.now()
+            date_obj = date.today()
 
     financial_year = get_financial_year(date_obj)
     # Swap folder order here
     year_folder = base_folder / financial_year / site_name
     year_folder.mkdir(parents=True, exist_ok=True)
 
-    # Scroll grid so row is visible
-    grid = page.locator("div.k-grid-content").first
-    await grid.evaluate(
-        "(gridEl, rowEl) => gridEl.scrollTop = rowEl.offsetTop - 20",
-        await row.element_handle()
-    )
-
-    # --- Download Work Order from 6th column (directly) ---
-    wo_cell = row.locator("td:nth-child(6) span.eip-link")
-    if await wo_cell.count():
-        work_order_text = (await wo_cell.first.text_content()).strip()
-        wo_safe = safe_filename(work_order_text)
-        wo_folder = year_folder / wo_safe
-        wo_folder.mkdir(parents=True, exist_ok=True)
-        wo_pdf_path = wo_folder / f"{wo_safe}.pdf"
-
-        if not wo_pdf_path.exists():
-            await wo_cell.first.click()
-            await download_pdf_modal(page, wo_pdf_path)
-        else:
-            logging.info(f"WorkOrder PDF already exists for {work_order_text}, skipping")
-    else:
-        logging.warning(f"No Work Order link in column 6 for invoice {invoice_no}")
-
-    # --- Download Bills ---
-    inv_span = row.locator("td:nth-child(1) span.eip-link")
-    await inv_span.scroll_into_view_if_needed()
-    await inv_span.click()
-
-    await page.wait_for_selector("span.eip-link.src-list", timeout=TIMEOUT)
-
-    bills_folder = wo_folder / "Bills"
-    bills_folder.mkdir(exist_ok=True)
-
-    bill_spans = page.locator("span.eip-link.src-list")
-    seen_bills = set()
-    for i in range(await bill_spans.count()):
-        bill_span = bill_spans.nth(i)
-        bill_text = (await bill_span.text_content() or f"Bill_{i+1}").strip()
-        bill_file = bills_folder / f"{safe_filename(bill_text)}.pdf"
-
-        if bill_text in seen_bills:
-            logging.info(f"Skipping duplicate bill: {bill_text}")
-            continue
-        if bill_file.exists():
-            logging.info(f"Bill PDF already exists: {bill_file.name}")
-            continue
-
-        seen_bills.add(bill_text)
-        await bill_span.click()
-        await download_pdf_modal(page, bill_file)
+    saves = []  # background save_as tasks, awaited before the invoice tab closes
+    # Paths claimed in the shared done set before their click, so another tab
+    # on an invoice with the same WO doesn't fetch the same file; released unless saved
+    claimed = []
 
-    # Close invoice tab
+    try:
+        # --- Download Work Order from 6th column (directly; click() scrolls it into view) ---
+        if work_order_text is not None:
+            wo_cell = row.locator(WO_LINK_SEL)
+            work_order_text = work_order_text.strip()
+            wo_safe = safe_filename(work_order_text)
+            wo_folder = year_folder / wo_safe
+            wo_folder.mkdir(parents=True, exist_ok=True)
+            wo_pdf_path = wo_folder / f"{wo_safe}.pdf"
+
+            if str(wo_pdf_path) not in done:
+                done.add(str(wo_pdf_path))
+                claimed.append(str(wo_pdf_path))
+                await wo_cell.first.click()
+                saves.append(await download_pdf_modal(page, wo_pdf_path))
+            else:
+                logging.info(f"WorkOrder PDF already exists for {work_order_text}, skipping")
+        else:
+            logging.warning(f"No Work Order link in column 6 for invoice {invoice_no}")
+
+        # --- Download Bills ---
+        inv_span = row.locator(INVOICE_LINK_SEL)
+        await inv_span.scroll_into_view_if_needed()
+        await inv_span.click()
+
+        await page.wait_for_selector(BILL_LINK_SEL, timeout=TIMEOUT)
+
+        bills_folder = wo_folder / "Bills"
+        bills_folder.mkdir(exist_ok=True)
+
+        bill_spans = page.locator(BILL_LINK_SEL)
+        seen_bills = set()
+        for i, bill_text in enumerate(await bill_spans.evaluate_all(TEXTS_JS)):
+            bill_span = bill_spans.nth(i)
+            bill_text = (bill_text or f"Bill_{i+1}").strip()
+            bill_file = bills_folder / f"{safe_filename(bill_text)}.pdf"
+
+            if bill_text in seen_bills:
+                logging.info(f"Skipping duplicate bill: {bill_text}")
+                continue
+            if str(bill_file) in done:
+                logging.info(f"Bill PDF already exists: {bill_file.name}")
+                continue
+
+            seen_bills.add(bill_text)
+            done.add(str(bill_file))
+            claimed.append(str(bill_file))
+            await bill_span.click()
+            saves.append(await download_pdf_modal(page, bill_file))
+    finally:
+        # Let every started save finish, even when a later click failed
+        results = await asyncio.gather(*saves, return_exceptions=True)
+        saved = {str(r) for r in results if isinstance(r, Path)}
+        done.difference_update(p for p in claimed if p not in saved)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+    # Saves done; close invoice tab
     await close_invoice_tab(page, invoice_no)
 
 async def get_current_page_number(page):
     try:
-        page_input = page.locator("kendo-pager-input input.k-input")
+        page_input = page.locator(PAGER_INPUT_SEL)
         val = await page_input.input_value()
         return int(val)
     except Exception:
@@ -140,65 +248,134 @@ async def get_current_page_number(page):
 
 async def go_to_page(page, page_num):
     try:
-        page_input = page.locator("kendo-pager-input input.k-input")
+        page_input = page.locator(PAGER_INPUT_SEL)
         await page_input.fill(str(page_num))
         await page_input.press("Enter")
-        await page.wait_for_selector("table.k-grid-table tbody tr", timeout=TIMEOUT)
+        await page.wait_for_selector(GRID_ROWS_SEL, timeout=TIMEOUT)
         logging.info(f"Navigated to page {page_num}")
     except Exception as e:
         logging.error(f"Failed to navigate to page {page_num}: {e}")
 
-async def process_all_pages(page, base_folder):
+async def return_to_page(page, page_num):
+    """Navigate to *page_num* and wait until its rows have replaced the old ones."""
+    first_invoice = await page.locator(FIRST_INVOICE_SEL).text_content()
+    await go_to_page(page, page_num)
+    # go_to_page returns while the old rows are still rendered
+    await page.wait_for_function(FIRST_INVOICE_CHANGED_JS, first_invoice, timeout=TIMEOUT)
+
+def invoice_row(page, inv_no):
+    """Grid row whose invoice link reads exactly *inv_no*, re-resolved on every action."""
+    link = page.locator(INVOICE_LINK_SEL, has_text=re.compile(rf"^\s*{re.escape(inv_no)}\s*$"))
+    return page.locator(GRID_ROWS_SEL).filter(has=link).first
+
+async def process_grid_page(page, page_num, base_folder, done, processed):
+    """Process every invoice row on the grid page currently shown; return the row count."""
+    # Wait for rows on current page
+    await page.wait_for_selector(GRID_ROWS_SEL, timeout=TIMEOUT)
+    row_cells = await page.locator(GRID_ROWS_SEL).evaluate_all(ROW_CELLS_JS)
+    logging.info(f"Found {len(row_cells)} rows on page {page_num}.")
+
+    for idx, (inv_no, date_str, site_name, wo_text) in enumerate(row_cells, start=1):
+        if inv_no is None:
+            logging.warning(f"No invoice link in row {idx} on page {page_num}, skipping")
+            continue
+        inv_no = inv_no.strip()
+        if inv_no in processed:
+            logging.info(f"Invoice {inv_no} already processed, skipping")
+            continue
+        try:
+            logging.info(f"Processing Invoice: {inv_no} (row {idx} on page {page_num})")
+            # Click through the row showing inv_no, not row idx: the grid may have reset since the snapshot
+            row = invoice_row(page, inv_no)
+            if not await row.count():
+                # never checkpointed, so the next run retries it
+                logging.warning(f"Invoice {inv_no} no longer shown on page {page_num}, skipping")
+                continue
+            await process_row(page, row, inv_no, date_str, site_name, wo_text, base_folder, done)
+            # only rows confirmed to show inv_no get here, so the checkpoint names the invoice opened
+            mark_processed(processed, inv_no)
+
+            # After closing invoice tab, ensure still on correct page (UI may reset)
+            actual_page = await get_current_page_number(page)
+            if actual_page != page_num:
+                logging.info(f"Page reset to {actual_page} after close, returning to page {page_num}...")
+                await return_to_page(page, page_num)
+
+        except Exception as e:
+            logging.error(f"Error processing invoice {inv_no} on page {page_num}: {e}")
+            folder = base_folder / safe_filename(inv_no)
+            folder.mkdir(parents=True, exist_ok=True)
+            await page.screenshot(path=str(folder / f"{safe_filename(inv_no)}_error.png"))
+
+    return len(row_cells)
+
+async def detect_total_pages(page, page_size):
+    try:
+        pager_info = await page.locator("kendo-pager-info").text_content()
+        match = PAGER_TOTAL_RE.search(pager_info)
+        total_items = int(match.group(1)) if match else None
+        if total_items and page_size:
+            total_pages = (total_items + page_size - 1) // page_size
+            logging.info(f"Total pages detected: {total_pages}")
+            return total_pages
+    except Exception:
+        logging.warning("Failed to detect total pages")
+    return None
+
+async def grid_page_worker(page, page_queue, base_folder, done, processed):
+    """Pull grid page numbers off the shared queue until it is empty; return the pages that failed."""
+    failed = []
+    while True:
+        try:
+            page_num = page_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return failed
+        logging.info(f"Processing page {page_num}...")
+        try:
+            if await get_current_page_number(page) != page_num:
+                await return_to_page(page, page_num)
+            await process_grid_page(page, page_num, base_folder, done, processed)
+        except Exception as e:
+            # one bad page must not stop this tab (or the others) from draining the queue
+            logging.error(f"Failed processing page {page_num}: {e}")
+            failed.append(page_num)
+
+async def process_all_pages(pages, base_folder, done, processed):
+    page = pages[0]
+    if len(pages) > 1:
+        # Split grid pages across the worker tabs, each holding its own search grid
+        await page.wait_for_selector(GRID_ROWS_SEL, timeout=TIMEOUT)
+        page_size = await page.locator(GRID_ROWS_SEL).count()
+        total_pages = await detect_total_pages(page, page_size)
+        if total_pages:
+            page_queue = asyncio.Queue()
+            for page_num in range(1, total_pages + 1):
+                page_queue.put_nowait(page_num)
+            results = await asyncio.gather(*(grid_page_worker(p, page_queue, base_folder, done, processed) for p in pages))
+            failed = sorted(n for pages_failed in results for n in pages_failed)
+            if failed:
+                logging.warning(f"Pages that failed and need a rerun: {failed}")
+            logging.info("Reached last page of grid.")
+            return
+        logging.warning("Total pages unknown, falling back to a single tab")
+
     total_pages = None
     current_page_num = 1
 
     while True:
         logging.info(f"Processing page {current_page_num}...")
-
-        # Wait for rows on current page
-        await page.wait_for_selector("table.k-grid-table tbody tr", timeout=TIMEOUT)
-        rows = await page.locator("table.k-grid-table tbody tr").all()
-        logging.info(f"Found {len(rows)} rows on page {current_page_num}.")
-
-        for idx, row in enumerate(rows, start=1):
-            try:
-                inv_no = (await row.locator("td:nth-child(1) span.eip-link").text_content()).strip()
-                logging.info(f"Processing Invoice: {inv_no} (row {idx} on page {current_page_num})")
-                await process_row(page, row, inv_no, base_folder)
-
-                # After closing invoice tab, ensure still on correct page (UI may reset)
-                actual_page = await get_current_page_number(page)
-                if actual_page != current_page_num:
-                    logging.info(f"Page reset to {actual_page} after close, returning to page {current_page_num}...")
-                    await go_to_page(page, current_page_num)
-                    await page.wait_for_selector("table.k-grid-table tbody tr", timeout=TIMEOUT)
-
-            except Exception as e:
-                logging.error(f"Error processing invoice {inv_no} on page {current_page_num}: {e}")
-                folder = base_folder / safe_filename(inv_no)
-                folder.mkdir(parents=True, exist_ok=True)
-                await page.screenshot(path=str(folder / f"{safe_filename(inv_no)}_error.png"))
+        page_size = await process_grid_page(page, current_page_num, base_folder, done, processed)
 
         # Detect total pages if unknown
         if not total_pages:
-            try:
-                pager_info = await page.locator("kendo-pager-info").text_content()
-                import re
-                match = re.search(r"of (\d+) items", pager_info)
-                total_items = int(match.group(1)) if match else None
-                page_size = len(rows)
-                if total_items and page_size:
-                    total_pages = (total_items + page_size - 1) // page_size
-                    logging.info(f"Total pages detected: {total_pages}")
-            except Exception:
-                logging.warning("Failed to detect total pages")
+            total_pages = await detect_total_pages(page, page_size)
 
         if total_pages and current_page_num >= total_pages:
             logging.info("Reached last page of grid.")
             break
 
         # Check for enabled Next button
-        next_button = page.locator("kendo-pager-next-buttons span.k-link.k-pager-nav")
+        next_button = page.locator(PAGER_NEXT_SEL)
         enabled_next_button = next_button.filter(has_not=page.locator(".k-state-disabled"))
 
         if await enabled_next_button.count() == 0:
@@ -212,8 +389,7 @@ async def process_all_pages(page, base_folder):
         prev_page_num = current_page_num
         prev_first_invoice = None
         try:
-            prev_first_invoice = await page.locator(
-                "table.k-grid-table tbody tr:nth-child(1) td:nth-child(1) span.eip-link").text_content()
+            prev_first_invoice = await page.locator(FIRST_INVOICE_SEL).text_content()
         except Exception:
             pass
 
@@ -231,10 +407,7 @@ async def process_all_pages(page, base_folder):
             if prev_first_invoice:
                 try:
                     await page.wait_for_function(
-                        """(oldInvoice) => {
-                            const el = document.querySelector('table.k-grid-table tbody tr:nth-child(1) td:nth-child(1) span.eip-link');
-                            return el && el.textContent.trim() !== oldInvoice.trim();
-                        }""",
+                        FIRST_INVOICE_CHANGED_JS,
                         prev_first_invoice,
                         timeout=TIMEOUT,
                     )
@@ -249,6 +422,9 @@ async def process_all_pages(page, base_folder):
 async def main():
     base_folder = DOWNLOAD_ROOT
     base_folder.mkdir(parents=True, exist_ok=True)
+    done = scan_downloaded(base_folder)  # PDFs from earlier runs
+    processed = load_checkpoint(CHECKPOINT)
+    logging.info(f"{len(done)} PDFs already downloaded, {len(processed)} invoices checkpointed")
 
     async with async_playwright() as pw:
         browser = await pw.chromium.launch(headless=HEADLESS)
@@ -260,10 +436,20 @@ async def main():
         await page.fill("#Username", USERNAME)
         await page.fill("input[name=Password]", PASSWORD)
         print("Solve CAPTCHA and click LOGIN, then press Enter…", end=""); input()
+        # Only after login: the CAPTCHA itself is an image
+        await context.route("**/*", block_assets)
         print("Navigate to Finance → Accounts Payable → Invoice Registration → All → set dates → Search, then press Enter…", end=""); input()
 
+        # Extra tabs share the login session; each needs the same search
+        pages = [page]
+        for tab_num in range(2, TABS + 1):
+            tab = await context.new_page()
+            await tab.goto(page.url)
+            print(f"In tab {tab_num}, repeat the same search, then press Enter…", end=""); input()
+            pages.append(tab)
+
         # Process all pages (with pagination and page tracking)
-        await process_all_pages(page, base_folder)
+        await process_all_pages(pages, base_folder, done, processed)
 
         logging.info("All downloads complete")
         await browser.close()
@@ -5,16 +5,22 @@ Robust L&T PDF-bill extractor
 • Scans “…/BILLS” folders recursively under BASE_DIR
 • Extracts BILL_NO and RUNNING_BILL_NO with multiple fall-backs
 • Parses header fields, work-done amounts and Annexure-III deductions
-• Uses a guarded ProcessPoolExecutor with chunked submission
-• Appends rows to a CSV in a crash-safe way (flush after every chunk)
+• Uses a guarded ProcessPoolExecutor with chunked map dispatch
+• Streams rows into the CSV as they arrive (flushed every FLUSH_EVERY)
+• Caches parsed rows by content hash, per PARSER_VERSION, so reruns only
+  parse new PDFs (files with unchanged size and mtime are not even re-hashed)
 """
 
 import csv
+import hashlib
 import logging
+import logging.handlers
+import multiprocessing
 import os
 import re
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from typing import List, Tuple, Optional
+import shelve
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple, Optional
 
 import fitz  # PyMuPDF
 
@@ -22,9 +28,14 @@ import fitz  # PyMuPDF
 
 BASE_DIR = "/Users/kumar/Desktop/LNT_Partner_Downloads"
 OUTPUT_CSV = "lnt_bills_output.csv"
-CHUNK_SIZE = 500                 # files per submission batch
-MAX_TASKS_PER_CHILD = 200        # recycle worker after N PDFs
+FLUSH_EVERY = 100                # flush the CSV after this many parsed PDFs
+MAX_TASKS_PER_CHILD = 200        # recycle worker after ~N PDFs (whole map chunks)
+WORKERS = int(os.getenv("LNT_EXTRACT_WORKERS") or os.cpu_count() or 1)
+CHUNKSIZE = int(os.getenv("LNT_EXTRACT_CHUNKSIZE") or 0)  # PDFs per dispatch; 0 = auto
 LOG_FILE = "lnt_bill_extractor.log"
+PARSER_VERSION = 1               # bump whenever parsing changes; starts a fresh row cache
+CACHE_DB = f"lnt_bill_cache_v{PARSER_VERSION}"  # shelve: content hash → row
+MANIFEST_DB = "lnt_bill_manifest"  # shelve: path under BASE_DIR → (mtime_ns, size, hash)
 
 FIELDNAMES = [
     "FILE", "BILL_NO", "RUNNING_BIL", "WO_NO", "JOB", "BILL_PERIOD",
@@ -56,233 +67,333 @@ _RUNNING_PATTERNS = [
     re.compile(r"RUNNING\s*BILL\s*:?[\s\n]*?(\d{1,4})", re.I),
 ]
 
-_DIGIT_LINE = re.compile(r"^\d{1,4}$")
+# None of the bill patterns can span a newline, so the first hit of the
+# combined pattern always sits on the first line any single pattern matches.
+_ANY_BILL = "|".join(p.pattern for p in _BILL_PATTERNS)
+_ANY_BILL_RE = re.compile(_ANY_BILL, re.I)
+# every bill ID contains "BIL" or "FBL"; a literal scan for them is far
+# cheaper than trying the full alternation at each offset
+_BILL_ANCHOR_RE = re.compile(r"BIL|FBL", re.I)
+
+# a bare 1-4 digit line within 10 lines after the label / 8 after a bill-ID
+_DIGIT_LINE = r"\n[^\S\n]*(\d{1,4})[^\S\n]*$"
+_RUNNING_AFTER_LABEL_RE = re.compile(
+    r"RUNNING BILL NO[^\n]*(?:\n[^\n]*){0,9}?" + _DIGIT_LINE, re.I | re.M
+)
+_RUNNING_AFTER_BILL_RE = re.compile(
+    r"(?:" + _ANY_BILL + r")[^\n]*(?:\n[^\n]*){0,7}?" + _DIGIT_LINE, re.I | re.M
+)
 
 
-def extract_bill_no(text: str, filename: str) -> str:
-    lines = text.splitlines()
+def extract_bill_numbers(text: str, filename: str) -> Tuple[str, str]:
+    """BILL_NO and RUNNING_BIL, locating the first bill-ID line only once."""
+    anchor = _BILL_ANCHOR_RE.search(text)
+    bill_match = None
+    if anchor:
+        line_start = text.rfind("\n", 0, anchor.start()) + 1
+        bill_match = _ANY_BILL_RE.search(text, line_start)
+    return (
+        extract_bill_no(text, filename, bill_match),
+        extract_running_bill_no(text, bill_match),
+    )
 
-    # pass 1 – direct line matches
-    for line in lines:
+
+def extract_bill_no(text: str, filename: str, bill_match: Optional[re.Match]) -> str:
+    if bill_match:
+        # keep the per-line pattern priority on the matching line
+        start = text.rfind("\n", 0, bill_match.start()) + 1
+        end = text.find("\n", bill_match.end())
+        line = text[start:end if end != -1 else None]
         for pat in _BILL_PATTERNS:
-            m = pat.search(line)
-            if m:
-                return m.group(0)
-
-    # pass 2 – up to 10 lines after literal label
-    for i, line in enumerate(lines):
-        if "BILL NO" in line.upper():
-            for j in range(i + 1, min(i + 11, len(lines))):
-                for pat in _BILL_PATTERNS:
-                    m = pat.search(lines[j])
-                    if m:
-                        return m.group(0)
-
-    # pass 3 – brute-force whole text
-    for pat in _BILL_PATTERNS:
-        m = pat.search(text)
-        if m:
-            return m.group(0)
+            hit = pat.search(line)
+            if hit:
+                return hit.group(0)
 
     # last resort: filename stem
     return os.path.splitext(filename)[0]
 
 
-def extract_running_bill_no(text: str) -> str:
+def extract_running_bill_no(text: str, bill_match: Optional[re.Match]) -> str:
     # labelled form anywhere
     for pat in _RUNNING_PATTERNS:
         m = pat.search(text)
         if m:
             return m.group(1)
 
-    lines = text.splitlines()
-
     # up to 10 lines after label
-    for i, line in enumerate(lines):
-        if "RUNNING BILL NO" in line.upper():
-            for j in range(i + 1, min(i + 11, len(lines))):
-                if _DIGIT_LINE.match(lines[j].strip()):
-                    return lines[j].strip()
-
-    # up to 8 lines after detected bill-ID
-    for i, line in enumerate(lines):
-        if any(p.search(line) for p in _BILL_PATTERNS):
-            for j in range(i + 1, min(i + 9, len(lines))):
-                if _DIGIT_LINE.match(lines[j].strip()):
-                    return lines[j].strip()
+    m = _RUNNING_AFTER_LABEL_RE.search(text)
+    if m:
+        return m.group(1)
+
+    # up to 8 lines after detected bill-ID; nothing before bill_match can match
+    if bill_match:
+        m = _RUNNING_AFTER_BILL_RE.search(text, bill_match.start())
+        if m:
+            return m.group(1)
 
     return "MISSING"
 
 
 # ────────────────────────── FIELD EXTRACTORS ─────────────────────── #
 
+# WO / Job / period in one scan; zero-width lookaheads so overlapping
+# fields match exactly as three separate searches would
+_HEADER_RE = re.compile(
+    r"(?=WO\s*No\.?\s*:?\s*(?P<WO>[\w/\-]+))"
+    r"|(?=Job\s*:?\s*(?P<JOB>[A-Za-z0-9 \-/&]+))"
+    r"|(?=BILL\s*PERIOD\s*:?\s*(?P<PERIOD>[A-Za-z0-9 \-/&]+))",
+    re.I,
+)
+_WORK_DONE_LABEL = "Total Work Done Amount"
+# the label line, then the (up to) five lines holding its amounts
+_WORK_DONE_RE = re.compile(
+    re.escape(_WORK_DONE_LABEL) + r"[^\n]*\n(?P<tail>[^\n]*(?:\n[^\n]*){0,4})"
+)
+_AMOUNT_RE = re.compile(r"[\d,]+\.\d+")
+
+# One Annexure-III entry: an 8-digit COA code line (not the "COA" header),
+# description lines up to the next code/amount line, then the next three
+# amount lines, skipping anything in between. With fewer than three amounts
+# left the entry runs to the end of the section.
+_AMOUNT_LINE = r"[^\S\n]*-?[\d,]+\.\d+[^\S\n]*$"
+_NEXT_AMOUNT = (
+    r"(?:\n(?!" + _AMOUNT_LINE + r")[^\n]*)*\n[^\S\n]*(-?[\d,]+\.\d+)[^\S\n]*$"
+)
+_DEDUCTION_BLOCK_RE = re.compile(
+    r"^(?![^\n]*coa)[^\S\n]*(\d{8}[^\n]*(?:\n(?!\d{8})(?!-?[\d,]+\.\d+$)[^\n]*)*)"
+    r"(?:" + _NEXT_AMOUNT
+    + r"(?:" + _NEXT_AMOUNT
+    + r"(?:" + _NEXT_AMOUNT + r"|[\s\S]*)|[\s\S]*)|[\s\S]*)",
+    re.M | re.I,
+)
+
+_ANNEXURE_RE = re.compile(r"annexure -iii", re.I)
+_DEDUCTION_END_RE = re.compile(r"total deduction amount", re.I)
+_DEDUCTIONS_RE = re.compile(r"deductions", re.I)
+
+# (keyword, CSV field) checked in order against the lower-cased
+# description; the first keyword found wins
+_DEDUCTION_KEYWORDS = (
+    ("tds", "TDS"),
+    ("retention", "RETENTION"),
+    ("sub - contract (labour)", "SUB_CONTRACT_LABOUR"),
+    ("pf/eps recovered", "PF_OR_EPS_RECOVERED"),
+    ("pf recovery from sc", "PF_OR_EPS_RECOVERED"),
+    ("esi employer", "ESI_EMPLOYERS_CONTRIBUTION"),
+    ("esi employee", "ESI_EMPLOYEES_CONTN_SUB_WORKER"),
+    ("rounding", "ROUNDING_OFF"),
+)
+# deduction columns (FIELDNAMES order) with their defaults; copied per PDF
+_EMPTY_DEDUCTIONS = dict.fromkeys(FIELDNAMES[FIELDNAMES.index("TDS"):], "0.00")
+
+
 def extract_header_fields(text: str) -> Tuple[str, str, str]:
-    wo = re.search(r"WO\s*No\.?\s*:?\s*([\w/\-]+)", text, re.I)
-    job = re.search(r"Job\s*:?\s*([A-Za-z0-9 \-/&]+)", text, re.I)
-    period = re.search(r"BILL\s*PERIOD\s*:?\s*([A-Za-z0-9 \-/&]+)", text, re.I)
+    found = {}
+    for m in _HEADER_RE.finditer(text):
+        found.setdefault(m.lastgroup, m.group(m.lastgroup))
+        if len(found) == 3:
+            break
     return (
-        wo.group(1) if wo else "",
-        job.group(1).strip() if job else "",
-        period.group(1).strip() if period else "",
+        found.get("WO", ""),
+        found.get("JOB", "").strip(),
+        found.get("PERIOD", "").strip(),
     )
 
 
 def extract_work_done_amounts(text: str) -> Tuple[float, float]:
-    lines = text.splitlines()
-    for i, line in enumerate(lines):
-        if "Total Work Done Amount" in line:
-            amounts = []
-            for j in range(i + 1, min(i + 6, len(lines))):
-                amounts += re.findall(r"[\d,]+\.\d+", lines[j])
-            if len(amounts) >= 4:
-                current = float(amounts[1].replace(",", ""))
-                tax = float(amounts[3].replace(",", ""))
-                return tax, current
+    m = _WORK_DONE_RE.search(text)
+    while m:
+        amounts = _AMOUNT_RE.findall(text, m.start("tail"), m.end("tail"))
+        if len(amounts) >= 4:
+            current = float(amounts[1].replace(",", ""))
+            tax = float(amounts[3].replace(",", ""))
+            return tax, current
+        m = _WORK_DONE_RE.search(text, m.start("tail"))
     return 0.0, 0.0
 
 
 def parse_annexure_deductions(text: str) -> dict:
-    ded = {
-        "TDS": "0.00",
-        "RETENTION": "0.00",
-        "SUB_CONTRACT_LABOUR": "0.00",
-        "PF_OR_EPS_RECOVERED": "0.00",
-        "ESI_EMPLOYERS_CONTRIBUTION": "0.00",
-        "ESI_EMPLOYEES_CONTN_SUB_WORKER": "0.00",
-        "ROUNDING_OFF": "0.00",
-    }
-
-    section_start = text.lower().find("annexure -iii")
-    if section_start == -1:
-        section_start = text.lower().find("deductions")
-    if section_start == -1:
-        return ded
+    ded = _EMPTY_DEDUCTIONS.copy()
 
-    section_end = text.lower().find("total deduction amount", section_start)
-    section = text[section_start:section_end if section_end != -1 else None]
-    lines = section.splitlines()
+    start = _ANNEXURE_RE.search(text) or _DEDUCTIONS_RE.search(text)
+    if not start:
+        return ded
 
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        if not line or "coa" in line.lower():
-            i += 1
+    end = _DEDUCTION_END_RE.search(text, start.start())
+    for block in _DEDUCTION_BLOCK_RE.finditer(
+        text, start.start(), end.start() if end else len(text)
+    ):
+        amount = block.group(3)  # second of up to three amounts
+        if amount is None:
             continue
-        if re.match(r"^\d{8}", line):
-            desc = line
-            j = i + 1
-            while j < len(lines) and not re.match(r"^\d{8}", lines[j]) and not re.match(r"^-?[\d,]+\.\d+$", lines[j]):
-                desc += " " + lines[j].strip()
-                j += 1
-            amounts = []
-            while j < len(lines) and len(amounts) < 3:
-                if re.match(r"^-?[\d,]+\.\d+$", lines[j].strip()):
-                    amounts.append(lines[j].strip())
-                j += 1
-            if len(amounts) >= 2:
-                val = f"{float(amounts[1].replace(',', '')):.2f}"
-                dlow = desc.lower()
-                if "tds" in dlow:
-                    ded["TDS"] = val
-                elif "retention" in dlow:
-                    ded["RETENTION"] = val
-                elif "sub - contract (labour)" in dlow:
-                    ded["SUB_CONTRACT_LABOUR"] = val
-                elif "pf/eps recovered" in dlow or "pf recovery from sc" in dlow:
-                    ded["PF_OR_EPS_RECOVERED"] = val
-                elif "esi employer" in dlow:
-                    ded["ESI_EMPLOYERS_CONTRIBUTION"] = val
-                elif "esi employee" in dlow:
-                    ded["ESI_EMPLOYEES_CONTN_SUB_WORKER"] = val
-                elif "rounding" in dlow:
-                    ded["ROUNDING_OFF"] = val
-            i = j
-        else:
-            i += 1
+        desc = " ".join(part.strip() for part in block.group(1).split("\n")).lower()
+        for keyword, field in _DEDUCTION_KEYWORDS:
+            if keyword in desc:
+                ded[field] = f"{float(amount.replace(',', '')):.2f}"
+                break
     return ded
 
 
 # ───────────────────────────── WORKER ────────────────────────────── #
 
-def process_pdf(pdf_path: str) -> Optional[dict]:
+def extract_text(data: bytes) -> str:
+    """Read pages in order, stopping once work-done and Annexure-III are both read."""
+    pages = []
+    work_done_seen = in_annexure = annexure_closed = False
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        for page in doc:
+            # same output as page.get_text(), minus its per-call option dispatch
+            page_text = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT).extractText()
+            pages.append(page_text)
+            work_done_seen = work_done_seen or _WORK_DONE_LABEL in page_text
+            if not in_annexure:
+                m = _ANNEXURE_RE.search(page_text)
+                if m:
+                    in_annexure = True
+                    page_text = page_text[m.end():]
+            if in_annexure and not annexure_closed:
+                annexure_closed = bool(_DEDUCTION_END_RE.search(page_text))
+            # everything parsed lives before the deductions total
+            if work_done_seen and annexure_closed:
+                break
+    return "\n".join(pages)
+
+
+def _init_worker(log_queue) -> None:
+    """Send log records to the parent's listener and silence MuPDF's stderr."""
+    logging.getLogger().handlers = [logging.handlers.QueueHandler(log_queue)]
+    fitz.TOOLS.mupdf_display_errors(False)
+
+
+def _pool_context():
+    # fork can't be combined with max_tasks_per_child; forkserver still
+    # forks from an already-imported process instead of spawning afresh
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def process_pdf(pdf_path: str) -> Tuple[Optional[str], Optional[tuple]]:
+    """(content hash, CSV row); the hash comes from the bytes already read for parsing."""
     fname = os.path.basename(pdf_path)
+    digest = None
     try:
-        with fitz.open(pdf_path) as doc:
-            text = "\n".join(page.get_text() or "" for page in doc)
+        with open(pdf_path, "rb") as f:
+            data = f.read()
+        digest = hashlib.blake2b(data).hexdigest()
+        text = extract_text(data)
     except Exception as e:
         logging.exception("Failed opening %s: %s", fname, e)
-        return None
+        return digest, None
     if not text.strip():
         logging.warning("%s: no extractable text", fname)
-        return None
+        return digest, None
 
-    bill_no = extract_bill_no(text, fname)
-    running_no = extract_running_bill_no(text)
+    bill_no, running_no = extract_bill_numbers(text, fname)
     wo_no, job, period = extract_header_fields(text)
     tax_amt, curr_amt = extract_work_done_amounts(text)
     total_amt = tax_amt + curr_amt
     ded = parse_annexure_deductions(text)
 
-    row = {
-        "FILE": fname,
-        "BILL_NO": bill_no,
-        "RUNNING_BIL": running_no,
-        "WO_NO": wo_no,
-        "JOB": job,
-        "BILL_PERIOD": period,
-        "TAX_AMT": f"{tax_amt:.2f}",
-        "CURRENT_BILL_AMOUNT": f"{curr_amt:.2f}",
-        "TOTAL_AMT": f"{total_amt:.2f}",
-        **ded,
-    }
-    return row
+    # FIELDNAMES order; ded is already keyed in column order
+    return digest, (
+        fname, bill_no, running_no, wo_no, job, period,
+        f"{tax_amt:.2f}", f"{curr_amt:.2f}", f"{total_amt:.2f}",
+        *ded.values(),
+    )
 
 
 # ───────────────────────────── DRIVER ────────────────────────────── #
 
-def write_rows(rows: List[dict]) -> None:
-    """Append a chunk of rows; header is written once."""
-    mode = "a" if os.path.exists(OUTPUT_CSV) else "w"
-    with open(OUTPUT_CSV, mode, newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
-        if f.tell() == 0:
-            writer.writeheader()
-        writer.writerows(rows)
-        f.flush()  # crash-safe
+def iter_bill_pdfs(root: str) -> Iterator[str]:
+    """Yield PDFs in every "bills" folder under *root* using os.scandir."""
+    in_bills = os.path.basename(root).lower() == "bills"
+    subdirs = []
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                elif in_bills and entry.name.lower().endswith(".pdf"):
+                    yield entry.path
+    except OSError:
+        return
+    for d in subdirs:
+        yield from iter_bill_pdfs(d)
 
 
 def collect_pdfs() -> List[str]:
-    pdfs = []
-    for root, _, files in os.walk(BASE_DIR):
-        if os.path.basename(root).lower() == "bills":
-            pdfs.extend(
-                os.path.join(root, f)
-                for f in files
-                if f.lower().endswith(".pdf")
-            )
-    return pdfs
+    return list(iter_bill_pdfs(BASE_DIR))
+
+
+def known_digest(pdf_path: str, manifest: shelve.Shelf) -> Tuple[str, tuple, Optional[str]]:
+    """(manifest key, (mtime_ns, size), hash); hash is None unless size and mtime are unchanged."""
+    st = os.stat(pdf_path)
+    key = os.path.relpath(pdf_path, BASE_DIR)
+    stamp = (st.st_mtime_ns, st.st_size)
+    entry = manifest.get(key)
+    return key, stamp, entry[2] if entry and entry[:2] == stamp else None
 
 
 def scan_and_process() -> None:
     pdf_files = collect_pdfs()
     logging.info("Found %d PDF files", len(pdf_files))
 
-    with ProcessPoolExecutor(
-        max_workers=os.cpu_count(),
-        max_tasks_per_child=MAX_TASKS_PER_CHILD,
-    ) as pool:
-        for idx in range(0, len(pdf_files), CHUNK_SIZE):
-            chunk = pdf_files[idx : idx + CHUNK_SIZE]
-            futures = [pool.submit(process_pdf, p) for p in chunk]
-
-            finished_rows = []
-            for fut in as_completed(futures):
-                res = fut.result()
-                if res:
-                    finished_rows.append(res)
-
-            write_rows(finished_rows)
-            logging.info("Processed %d / %d PDFs", idx + len(chunk), len(pdf_files))
+    workers = max(1, WORKERS)
+    # workers log through a queue; only this process writes the log file
+    ctx = _pool_context()
+    log_queue = ctx.Queue()
+    listener = logging.handlers.QueueListener(
+        log_queue, *logging.getLogger().handlers, respect_handler_level=True
+    )
+    listener.start()
+    try:
+        with (
+            shelve.open(CACHE_DB) as cache,
+            shelve.open(MANIFEST_DB) as manifest,
+            open(OUTPUT_CSV, "a", newline="", encoding="utf-8", buffering=1 << 20) as out,
+        ):
+            writer = csv.writer(out)
+            if out.tell() == 0:
+                writer.writerow(FIELDNAMES)
+
+            # unchanged files come from the cache; everything else is read
+            # (and hashed) once, by the worker that parses it
+            pending = []  # (path, manifest key, (mtime_ns, size)) still to be parsed
+            for path in pdf_files:
+                key, stamp, digest = known_digest(path, manifest)
+                cached = cache.get(digest) if digest else None
+                if cached:
+                    writer.writerow((os.path.basename(path), *cached[1:]))
+                else:
+                    pending.append((path, key, stamp))
+            out.flush()
+            logging.info("%d PDFs from cache, %d to parse", len(pdf_files) - len(pending), len(pending))
+
+            # several PDFs per IPC round-trip instead of one pickle per file
+            map_chunksize = CHUNKSIZE or max(1, len(pending) // (workers * 4))
+            map_chunksize = min(map_chunksize, MAX_TASKS_PER_CHILD)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(log_queue,),
+                # each map chunk counts as one task, so convert PDFs to chunks
+                max_tasks_per_child=max(1, MAX_TASKS_PER_CHILD // map_chunksize),
+            ) as pool:
+                results = pool.map(process_pdf, [p for p, _, _ in pending], chunksize=map_chunksize)
+                for done, ((_, key, stamp), (digest, row)) in enumerate(zip(pending, results), start=1):
+                    if digest:
+                        manifest[key] = (*stamp, digest)
+                    if row:
+                        cache[digest] = row
+                        writer.writerow(row)
+                    if done % FLUSH_EVERY == 0 or done == len(pending):
+                        out.flush()  # crash-safe
+                        logging.info("Processed %d / %d PDFs", done, len(pending))
+    finally:
+        listener.stop()
 
 
 # ────────────────────────────── MAIN ─────────────────────────────── #
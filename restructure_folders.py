@@ -11,7 +11,9 @@ Usage
 python restructure_folders.py  /path/to/LNT_Partner_Downloads
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import os
 import shutil
 import argparse
 import logging
@@ -21,28 +23,59 @@ logging.basicConfig(
     format="%(levelname)s: %(message)s"
 )
 
+MOVE_WORKERS = 32   # moves are rename syscalls (or copies across filesystems)
+
+def _subdirs(path):
+    """Directory entries directly under *path* (unreadable folders give none, like glob)."""
+    try:
+        with os.scandir(path) as entries:
+            return [e for e in entries if e.is_dir()]
+    except OSError:
+        return []
+
+def iter_wod_dirs(base: Path):
+    """Yield (site, fy_year, wod) for every folder three levels below *base*."""
+    for site in _subdirs(base):
+        for fy_year in _subdirs(site.path):
+            for wod in _subdirs(fy_year.path):
+                yield site.name, fy_year.name, wod.name
+
+def move_dir(pair) -> None:
+    src, dst = pair
+    try:
+        os.rename(src, dst)         # same filesystem: a single syscall
+    except OSError:
+        shutil.move(str(src), str(dst))
+
 def migrate_tree(base: Path) -> None:
     """
     Walk   base/SITE/FY/WOD[…]
     Move → base/FY/SITE/WOD[…]
     """
-    # Find every WOD folder three levels deep
-    pattern = "*/*/*"           # site / year / WOD
-    for wod_dir in (d for d in base.glob(pattern) if d.is_dir()):
-        site, fy_year, wod = wod_dir.parts[-3:]
-        src = wod_dir
+    # Plan every move first: site / year / WOD folders three levels deep.
+    # Listing up front also keeps freshly moved folders from being revisited.
+    moves = []
+    for site, fy_year, wod in iter_wod_dirs(base):
+        src = base / site / fy_year / wod
         dst = base / fy_year / site / wod
         if dst.exists():
             logging.warning("Skip – destination already exists: %s", dst)
             continue
-        dst.parent.mkdir(parents=True, exist_ok=True)
         logging.info("Move %s  →  %s", src.relative_to(base), dst.relative_to(base))
-        shutil.move(str(src), str(dst))
+        moves.append((src, dst))
+
+    for parent in {dst.parent for _, dst in moves}:
+        parent.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(MOVE_WORKERS) as pool:
+        list(pool.map(move_dir, moves))
 
-    # Remove now-empty “site/year” holders
-    for empty in sorted(base.glob("*/*"), reverse=True):
-        if empty.is_dir() and not any(empty.iterdir()):
-            empty.rmdir()
+    # Remove now-empty “site/year” holders; rmdir itself refuses non-empty ones
+    for site in _subdirs(base):
+        for holder in _subdirs(site.path):
+            try:
+                os.rmdir(holder.path)
+            except OSError:
+                pass
 
 def main():
     ap = argparse.ArgumentParser(description="Restructure LNT download tree")
@@ -15,48 +15,61 @@ base_zips/
 
 Usage
 -----
-python zip_by_year_split.py  /path/to/LNT_Partner_Downloads  [--out OUTDIR]
+python zip_by_year_split.py  /path/to/LNT_Partner_Downloads  [--out OUTDIR] [--level N]
+
+PDFs are stored as-is (they are already compressed); other files are
+DEFLATE-compressed at --level.
 """
 
 import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from zipfile import ZipFile, ZIP_DEFLATED
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
 
 MAX_PART = 23 * 1024 * 1024            # 23 MiB limit
 COMPRESSION = ZIP_DEFLATED             # widely supported
+COMPRESS_LEVEL = 6                     # DEFLATE level for non-PDF files (--level)
+STORED_SUFFIXES = {".pdf"}             # already compressed; DEFLATE gains ~nothing
 
-def iter_files(root: Path):
-    """Yield all files under *root* with paths relative to *root*."""
-    for path in root.rglob("*"):
-        if path.is_file():
-            yield path, path.relative_to(root)
+def iter_files(root: Path, rel: Path = Path()):
+    """Yield (path, path relative to *root*, size) for all files under *root*."""
+    # one scandir pass; DirEntry caches its stat, so each file is stat'ed once
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if not entry.is_symlink():  # like rglob, don't follow dir links
+                    yield from iter_files(Path(entry.path), rel / entry.name)
+            elif entry.is_file():
+                yield Path(entry.path), rel / entry.name, entry.stat().st_size
 
-def zip_year_folder(src_dir: Path, dest_root: Path) -> None:
+def zip_year_folder(src_dir: Path, dest_root: Path, level: int = COMPRESS_LEVEL) -> str:
     fy = src_dir.name
     part = 1
     zip_path = dest_root / f"{fy}_part{part}.zip"
-    zf = ZipFile(zip_path, "w", compression=COMPRESSION, compresslevel=6)
+    zf = ZipFile(zip_path, "w", compression=COMPRESSION, compresslevel=level)
     bytes_written = 0
 
-    for abs_path, rel_path in iter_files(src_dir):
-        size_guess = abs_path.stat().st_size
+    for abs_path, rel_path, size_guess in iter_files(src_dir):
         # Start new part if adding this file would exceed MAX_PART
         if bytes_written and bytes_written + size_guess > MAX_PART:
             zf.close()
             part += 1
             zip_path = dest_root / f"{fy}_part{part}.zip"
-            zf = ZipFile(zip_path, "w", compression=COMPRESSION, compresslevel=6)
+            zf = ZipFile(zip_path, "w", compression=COMPRESSION, compresslevel=level)
             bytes_written = 0
-        zf.write(abs_path, rel_path)
-        zf.fp.flush()
-        bytes_written = zf.fp.tell()
+        stored = abs_path.suffix.lower() in STORED_SUFFIXES
+        zf.write(abs_path, rel_path, compress_type=ZIP_STORED if stored else None)
+        # ZipFile records the archive offset after each entry; no flush/tell needed
+        bytes_written = zf.start_dir
 
     # Rename single-part archive to drop “_part1”
     zf.close()
     if part == 1:
         final = dest_root / f"{fy}.zip"
         zip_path.rename(final)
+    return fy
 
 def main():
     ap = argparse.ArgumentParser(description="Create ≤23 MB zip parts per FY")
@@ -64,6 +77,8 @@ def main():
                     help="Root folder arranged as FY/Site/WOD (output of restructure script)")
     ap.add_argument("--out", type=Path, default=None,
                     help="Destination directory for zips (default: sibling *_zips)")
+    ap.add_argument("--level", type=int, default=COMPRESS_LEVEL, choices=range(10),
+                    metavar="0-9", help="DEFLATE level for non-PDF files (default: 6)")
     args = ap.parse_args()
 
     base = args.base_folder
@@ -73,9 +88,11 @@ def main():
     out_dir = args.out or base.with_name(f"{base.name}_zips")
     out_dir.mkdir(exist_ok=True)
 
-    for fy_dir in sorted(d for d in base.iterdir() if d.is_dir()):
-        zip_year_folder(fy_dir, out_dir)
-        print(f"✓ Zipped {fy_dir.name}")
+    # DEFLATE is CPU-bound and each FY writes its own parts, so zip FYs in parallel
+    fy_dirs = sorted(d for d in base.iterdir() if d.is_dir())
+    with ProcessPoolExecutor() as pool:
+        for fy in pool.map(zip_year_folder, fy_dirs, repeat(out_dir), repeat(args.level)):
+            print(f"✓ Zipped {fy}")
 
     print(f"🎉  All zips saved in {out_dir}")
 